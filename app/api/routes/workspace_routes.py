@@ -31,11 +31,19 @@ class AddParticipantRequest(BaseModel):
     user_id: str
 
 
+class AddParticipantsRequest(BaseModel):
+    user_ids: List[str] = Field(..., min_length=1, max_length=100)
+
+
 class SendMessageRequest(BaseModel):
     content: str
     metadata: Optional[Dict[str, Any]] = None
 
 
+class SendMessagesRequest(BaseModel):
+    messages: List[SendMessageRequest] = Field(..., min_length=1, max_length=100)
+
+
 class WorkspaceChatRequest(BaseModel):
     """Chat request for workspace collaborative chat."""
     message: str
@@ -218,6 +226,32 @@ async def add_participant(
     return {"success": False, "message": "User is already a participant"}
 
 
+@router.post("/{workspace_id}/participants/batch")
+async def add_participants(
+    workspace_id: str,
+    request: AddParticipantsRequest,
+    added_by: str = Query(..., description="User ID adding the participants")
+):
+    """Add several participants to a workspace in one request"""
+    workspace = workspace_manager.get_workspace(workspace_id)
+    
+    if not workspace:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    
+    if not workspace.is_participant(added_by):
+        raise HTTPException(status_code=403, detail="Not authorized to add participants")
+    
+    new_ids = [uid for uid in dict.fromkeys(request.user_ids) if not workspace.is_participant(uid)]
+    added = workspace_manager.bulk_add_participants(workspace_id, new_ids, added_by)
+    
+    for user_id in new_ids:
+        await chat_ws_manager.broadcast_presence_update(workspace_id, user_id, "added")
+    
+    if added:
+        return {"success": True, "added": added, "message": f"{added} users added to workspace"}
+    return {"success": False, "added": 0, "message": "All users are already participants"}
+
+
 @router.delete("/{workspace_id}/participants/{target_user_id}")
 async def remove_participant(
     workspace_id: str,
@@ -308,6 +342,59 @@ async def send_message(
     return message_to_response(message)
 
 
+@router.post("/{workspace_id}/messages/bulk", response_model=List[MessageResponse])
+async def send_messages(
+    workspace_id: str,
+    request: SendMessagesRequest,
+    user_id: str = Query(..., description="User ID sending the messages")
+):
+    """
+    Send several messages to a workspace in one request, in order.
+    
+    The batch is not atomic: messages are stored and broadcast one at a time.
+    If one fails (e.g. the workspace is deleted mid-batch), the ones before it
+    stay stored and the 500 detail says how many were saved.
+    """
+    workspace = workspace_manager.get_workspace(workspace_id)
+    
+    if not workspace:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    
+    if not workspace.is_participant(user_id):
+        raise HTTPException(status_code=403, detail="Not authorized to send messages to this workspace")
+    
+    # Validate the whole batch before adding anything
+    if any(not item.content.strip() for item in request.messages):
+        raise HTTPException(status_code=400, detail="Message content cannot be empty")
+    
+    responses = []
+    for item in request.messages:
+        message = await workspace_manager.add_message(
+            workspace_id=workspace_id,
+            sender_id=user_id,
+            role="user",
+            content=item.content,
+            metadata=item.metadata
+        )
+        
+        if not message:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to add message {len(responses) + 1} of {len(request.messages)}; "
+                       f"the first {len(responses)} were stored"
+            )
+        
+        # Each message is still broadcast on its own, as with single sends
+        await chat_ws_manager.broadcast_message(
+            workspace_id,
+            message.to_dict(),
+            exclude_user=user_id
+        )
+        responses.append(message_to_response(message))
+    
+    return responses
+
+
 @router.post("/{workspace_id}/chat")
 async def workspace_chat(
     workspace_id: str,
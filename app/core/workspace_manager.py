@@ -3,7 +3,7 @@ Workspace & Collaborative Conversation Manager
 Manages workspaces (document sessions) with multi-user support, contextful conversations,
 and real-time collaboration capabilities.
 """
-from typing import Dict, List, Optional, Any, Set
+from typing import Dict, Iterable, List, Optional, Any, Set
 from datetime import datetime
 from dataclasses import dataclass, field
 import uuid
@@ -11,7 +11,7 @@ import time
 import asyncio
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatMessage:
     """Enhanced chat message with sender and context information"""
     id: str
@@ -102,6 +102,15 @@ class Workspace:
             return True
         return False
     
+    def add_participants(self, user_ids: Iterable[str]) -> int:
+        """Add several users at once; returns how many were new"""
+        before = len(self.participants)
+        self.participants.update(user_ids)
+        added = len(self.participants) - before
+        if added:
+            self.updated_at = time.time()
+        return added
+    
     def remove_participant(self, user_id: str) -> bool:
         """Remove a user from the workspace (owner cannot be removed)"""
         if user_id != self.owner_id and user_id in self.participants:
@@ -140,8 +149,11 @@ class Workspace:
     def _trim_messages(self):
         """Keep only the last max_messages, preserving system messages"""
         if len(self.messages) > self.max_messages:
-            system_messages = [m for m in self.messages if m.role == "system"]
-            other_messages = [m for m in self.messages if m.role != "system"]
+            # One pass over the history; this runs on every add once the cap is reached
+            system_messages: List[ChatMessage] = []
+            other_messages: List[ChatMessage] = []
+            for m in self.messages:
+                (system_messages if m.role == "system" else other_messages).append(m)
             keep_count = self.max_messages - len(system_messages)
             self.messages = system_messages + other_messages[-keep_count:]
     
@@ -408,6 +420,33 @@ class WorkspaceManager:
             return True
         return False
     
+    def bulk_add_participants(self, workspace_id: str, user_ids: Iterable[str], added_by: str) -> int:
+        """Add several participants to a workspace at once; returns how many were new"""
+        workspace = self.workspaces.get(workspace_id)
+        if not workspace:
+            return 0
+        
+        # Only owner or existing participants can add others
+        if not workspace.is_participant(added_by):
+            return 0
+        
+        new_ids = set(user_ids) - workspace.participants
+        if not new_ids:
+            return 0
+        
+        workspace.add_participants(new_ids)
+        for user_id in new_ids:
+            self.user_workspaces.setdefault(user_id, set()).add(workspace_id)
+        
+        # Auto-save to MongoDB once for the whole batch
+        try:
+            from app.core.mongodb_db import db as mongodb_db
+            self.save_workspace_to_mongodb(workspace_id, mongodb_db)
+        except Exception as e:
+            print(f"Failed to auto-save workspace {workspace_id} after adding participants: {e}")
+        
+        return len(new_ids)
+    
     async def add_message(
         self,
         workspace_id: str,
@@ -59,6 +59,7 @@ from app.utils.utils import (
     get_google_credentials,
     create_google_doc,
     make_style_skeleton_from_docx,
+    skeleton_formatting_map,
     safe_encoder,
     write_docx_with_skeleton,
     make_style_sequence_from_docx
@@ -2971,6 +2972,12 @@ async def extract_style_skeleton(request: StyleRequest):
         
         # Extract style skeleton using real implementation
         skeleton = make_style_skeleton_from_docx(local_file["path"])
+        # Per-paragraph formatting is stored as columns; expose it as formatting_map
+        skeleton = {
+            "styles": skeleton["styles"],
+            "default_font": skeleton["default_font"],
+            "formatting_map": skeleton_formatting_map(skeleton),
+        }
         
         if request.output_format == "docx":
             # Save skeleton as DOCX template
@@ -0,0 +1,211 @@
+"""
+Shared pytest fixtures for the test suite.
+"""
+import asyncio
+import hashlib
+import importlib
+import inspect
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.workspace_manager import Workspace, WorkspaceManager, legacy_conversation_adapter
+from app.core.chat_websocket import ChatWebSocketManager
+
+try:
+    import pytest_asyncio  # noqa: F401
+    PYTEST_ASYNCIO_SUPPORT = True
+except ImportError:
+    PYTEST_ASYNCIO_SUPPORT = False
+
+
+# pytest cache key holding {nodeid: source hash} for pure tests that last passed
+_PURE_CACHE_KEY = "resulthash/passed"
+_pure_hash_key = pytest.StashKey[str]()
+_pure_results: dict = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--skip-cached-pure", action="store_true", default=False,
+        help="skip tests marked pure whose sources are unchanged since they last passed"
+    )
+
+
+def pytest_configure(config):
+    # Registered here as well so the mark is known when pytest-xdist isn't installed
+    config.addinivalue_line(
+        "markers", "xdist_group(name): keep these tests on one pytest-xdist worker (--dist loadgroup)"
+    )
+    config.addinivalue_line(
+        "markers", "pure(*modules): result depends only on the test file, conftest and these modules"
+    )
+
+
+def _pure_source_hash(item, marker) -> str:
+    """blake2b over the test file, this conftest and every module named in the marker"""
+    h = hashlib.blake2b()
+    for path in (item.path, Path(__file__), *(importlib.import_module(name).__file__ for name in marker.args)):
+        h.update(Path(path).read_bytes())
+    return h.hexdigest()
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    """Hash pure tests; skip them (before any fixture runs) on a cached pass"""
+    marker = item.get_closest_marker("pure")
+    if marker is None or getattr(item.config, "cache", None) is None:
+        return
+    digest = item.stash[_pure_hash_key] = _pure_source_hash(item, marker)
+    if item.config.getoption("skip_cached_pure"):
+        if item.config.cache.get(_PURE_CACHE_KEY, {}).get(item.nodeid) == digest:
+            pytest.skip("cached pass")
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    report = outcome.get_result()
+    digest = item.stash.get(_pure_hash_key, None)
+    if digest is None or report.skipped:
+        return
+    if report.failed:
+        _pure_results[item.nodeid] = None
+    elif report.when == "call":
+        _pure_results[item.nodeid] = digest
+
+
+def _store_pure_results(session):
+    if not _pure_results or getattr(session.config, "cache", None) is None:
+        return
+    cached = session.config.cache.get(_PURE_CACHE_KEY, {})
+    for nodeid, digest in _pure_results.items():
+        if digest is None:
+            cached.pop(nodeid, None)
+        else:
+            cached[nodeid] = digest
+    session.config.cache.set(_PURE_CACHE_KEY, cached)
+
+
+# Only created by the fallback below when pytest-asyncio isn't installed
+_session_loop = None
+
+if not PYTEST_ASYNCIO_SUPPORT:
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_pyfunc_call(pyfuncitem):
+        """Run `async def` tests on one session-wide loop when pytest-asyncio isn't installed"""
+        global _session_loop
+        if not inspect.iscoroutinefunction(pyfuncitem.obj):
+            return None
+        if _session_loop is None:
+            _session_loop = asyncio.new_event_loop()
+        argnames = pyfuncitem._fixtureinfo.argnames
+        _session_loop.run_until_complete(
+            pyfuncitem.obj(**{name: pyfuncitem.funcargs[name] for name in argnames})
+        )
+        return True
+
+
+def pytest_sessionfinish(session):
+    _store_pure_results(session)
+    if _session_loop is not None:
+        _session_loop.close()
+
+
+@pytest.fixture(autouse=True)
+def _reset_legacy_adapter():
+    """Drop default workspaces the legacy adapter created during a test"""
+    yield
+    defaults = legacy_conversation_adapter._user_default_workspaces
+    for user_id, ws_id in defaults.items():
+        legacy_conversation_adapter._workspace_manager.delete_workspace(ws_id, user_id)
+    defaults.clear()
+
+
+@pytest.fixture(scope="session")
+def manager():
+    """One WorkspaceManager shared by every test in the session"""
+    return WorkspaceManager()
+
+
+@pytest.fixture
+def user_id(manager):
+    """A new test user; every workspace they own is deleted after the test"""
+    uid = f"test_user_{uuid.uuid4().hex[:8]}"
+    yield uid
+    for ws_id in [ws.id for ws in manager.workspaces.values() if ws.owner_id == uid]:
+        manager.delete_workspace(ws_id, uid)
+
+
+@pytest.fixture
+def workspace(manager, user_id):
+    """A fresh workspace owned by a new test user, deleted after the test"""
+    ws = manager.create_workspace(owner_id=user_id)
+    yield ws
+    manager.delete_workspace(ws.id, user_id)
+
+
+@pytest.fixture(scope="session")
+def chat_manager():
+    """One ChatWebSocketManager shared by every test in the session"""
+    return ChatWebSocketManager()
+
+
+@pytest.fixture(scope="session")
+def thread_pool():
+    """Five worker threads shared by the concurrency tests, shut down at session end"""
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        yield executor
+
+
+@pytest.fixture(scope="session")
+def populated_workspace_template():
+    """to_dict() of a workspace holding "Message 0".."Message 19", built once"""
+    ws = Workspace(id="ws_populated", name="Populated WS", owner_id="test_user_seed")
+    for i in range(20):
+        ws.add_message(ws.owner_id, "user", f"Message {i}")
+    return ws.to_dict()
+
+
+@pytest.fixture
+def populated_workspace(populated_workspace_template):
+    """A private copy of the populated template, safe to mutate"""
+    return Workspace.from_dict(populated_workspace_template)
+
+
+@pytest.fixture(scope="session")
+def restored_workspace():
+    """A Workspace rebuilt once via from_dict; shared, so tests must not mutate it"""
+    user_id = "test_user_restored"
+    return Workspace.from_dict({
+        "id": "ws_123",
+        "name": "Restored WS",
+        "owner_id": user_id,
+        "participants": [user_id],
+        "messages": [
+            {
+                "id": "msg_1",
+                "conversation_id": "ws_123",
+                "sender_id": user_id,
+                "role": "user",
+                "content": "Hello",
+                "timestamp": 1234567890.0
+            }
+        ],
+        "documents": {
+            "file_1": {
+                "file_id": "file_1",
+                "filename": "doc.docx",
+                "file_type": "docx"
+            }
+        },
+        "created_at": 1234567890.0,
+        "updated_at": 1234567890.0
+    })
@@ -2,14 +2,18 @@
 Test Collaborative Chat Sharing Features
 This script verifies that the sharing functionality works correctly.
 """
-import requests
+import asyncio
+import httpx
 import json
-from typing import Optional
+import sys
+from operator import itemgetter
+from typing import List, Optional
 
 # Configuration
 BASE_URL = "http://localhost:8000"
 TEST_USER_ID = "test-owner@example.com"
 TEST_PARTICIPANT_EMAIL = "participant@example.com"
+SESSIONS_PATH = "/chat/sessions"
 
 class Colors:
     GREEN = '\033[92m'
@@ -18,25 +22,34 @@ class Colors:
     BLUE = '\033[94m'
     END = '\033[0m'
 
+# Color + icon prefixes, built once rather than per printed line
+_GREEN_OK = f"{Colors.GREEN}✅ "
+_RED_X = f"{Colors.RED}❌ "
+_BLUE_I = f"{Colors.BLUE}ℹ️  "
+_YELLOW_W = f"{Colors.YELLOW}⚠️  "
+_END = Colors.END
+_PASS = f"{Colors.GREEN}✅ PASS{Colors.END}"
+_FAIL = f"{Colors.RED}❌ FAIL{Colors.END}"
+
 def print_success(msg: str):
-    print(f"{Colors.GREEN}✅ {msg}{Colors.END}")
+    print(_GREEN_OK, msg, _END, sep="")
 
 def print_error(msg: str):
-    print(f"{Colors.RED}❌ {msg}{Colors.END}")
+    print(_RED_X, msg, _END, sep="")
 
 def print_info(msg: str):
-    print(f"{Colors.BLUE}ℹ️  {msg}{Colors.END}")
+    print(_BLUE_I, msg, _END, sep="")
 
 def print_warning(msg: str):
-    print(f"{Colors.YELLOW}⚠️  {msg}{Colors.END}")
+    print(_YELLOW_W, msg, _END, sep="")
 
-def test_create_session(user_id: str) -> Optional[str]:
+async def test_create_session(client: httpx.AsyncClient, user_id: str) -> Optional[str]:
     """Test creating a chat session"""
     print_info("Test 1: Creating a chat session...")
     
     try:
-        response = requests.post(
-            f"{BASE_URL}/chat/sessions",
+        response = await client.post(
+            SESSIONS_PATH,
             params={"user_id": user_id},
             json={"title": "Test Collaborative Session"}
         )
@@ -54,13 +67,13 @@ def test_create_session(user_id: str) -> Optional[str]:
         print_error(f"Exception creating session: {e}")
         return None
 
-def test_share_session(session_id: str, user_id: str) -> bool:
+async def test_share_session(client: httpx.AsyncClient, session_url: str, user_id: str) -> bool:
     """Test enabling sharing for a session"""
     print_info("Test 2: Enabling sharing...")
     
     try:
-        response = requests.post(
-            f"{BASE_URL}/chat/sessions/{session_id}/share",
+        response = await client.post(
+            f"{session_url}/share",
             params={"user_id": user_id},
             json={"participant_emails": []}
         )
@@ -81,13 +94,13 @@ def test_share_session(session_id: str, user_id: str) -> bool:
         print_error(f"Exception enabling sharing: {e}")
         return False
 
-def test_get_participants(session_id: str, user_id: str) -> bool:
+async def test_get_participants(client: httpx.AsyncClient, session_url: str, user_id: str) -> bool:
     """Test getting participant list"""
     print_info("Test 3: Getting participants...")
     
     try:
-        response = requests.get(
-            f"{BASE_URL}/chat/sessions/{session_id}/participants",
+        response = await client.get(
+            f"{session_url}/participants",
             params={"user_id": user_id}
         )
         
@@ -97,7 +110,8 @@ def test_get_participants(session_id: str, user_id: str) -> bool:
             print_success(f"Got {len(participants)} participant(s)")
             
             # Check if owner is in participants
-            owner_found = any(p.get("user_id") == user_id for p in participants)
+            user_ids = {p.get("user_id") for p in participants}
+            owner_found = user_id in user_ids
             if owner_found:
                 print_success("Owner is in participant list")
                 for p in participants:
@@ -115,36 +129,45 @@ def test_get_participants(session_id: str, user_id: str) -> bool:
         print_error(f"Exception getting participants: {e}")
         return False
 
-def test_add_participant(session_id: str, user_id: str, participant_email: str) -> bool:
+async def add_participants_bulk(client: httpx.AsyncClient, session_url: str, user_id: str, emails: List[str]) -> list:
+    """Add every email concurrently; returns one response (or exception) per email, in order"""
+    return await asyncio.gather(
+        *(
+            client.post(
+                f"{session_url}/participants",
+                params={"user_id": user_id},
+                json={"email": email}
+            )
+            for email in emails
+        ),
+        return_exceptions=True
+    )
+
+async def test_add_participant(client: httpx.AsyncClient, session_url: str, user_id: str, participant_email: str) -> bool:
     """Test adding a participant"""
     print_info(f"Test 4: Adding participant '{participant_email}'...")
     
-    try:
-        response = requests.post(
-            f"{BASE_URL}/chat/sessions/{session_id}/participants",
-            params={"user_id": user_id},
-            json={"email": participant_email}
-        )
-        
-        if response.status_code == 200:
-            print_success(f"Added participant: {participant_email}")
-            return True
-        else:
-            print_error(f"Failed to add participant: {response.status_code}")
-            print(response.text)
-            return False
-    except Exception as e:
-        print_error(f"Exception adding participant: {e}")
+    response, = await add_participants_bulk(client, session_url, user_id, [participant_email])
+    if isinstance(response, Exception):
+        print_error(f"Exception adding participant: {response}")
+        return False
+    
+    if response.status_code == 200:
+        print_success(f"Added participant: {participant_email}")
+        return True
+    else:
+        print_error(f"Failed to add participant: {response.status_code}")
+        print(response.text)
         return False
 
-def test_participant_access(session_id: str, participant_id: str) -> bool:
+async def test_participant_access(client: httpx.AsyncClient, session_url: str, participant_id: str) -> bool:
     """Test that participant can access the session"""
     print_info("Test 5: Checking participant access...")
     
     try:
         # Test getting messages as participant
-        response = requests.get(
-            f"{BASE_URL}/chat/sessions/{session_id}/messages",
+        response = await client.get(
+            f"{session_url}/messages",
             params={"user_id": participant_id, "limit": 10}
         )
         
@@ -161,15 +184,15 @@ def test_participant_access(session_id: str, participant_id: str) -> bool:
         print_error(f"Exception checking participant access: {e}")
         return False
 
-def test_unauthorized_access(session_id: str) -> bool:
+async def test_unauthorized_access(client: httpx.AsyncClient, session_url: str) -> bool:
     """Test that unauthorized user cannot access"""
     print_info("Test 6: Checking unauthorized access is blocked...")
     
     unauthorized_user = "unauthorized@example.com"
     
     try:
-        response = requests.get(
-            f"{BASE_URL}/chat/sessions/{session_id}/messages",
+        response = await client.get(
+            f"{session_url}/messages",
             params={"user_id": unauthorized_user, "limit": 10}
         )
         
@@ -186,13 +209,13 @@ def test_unauthorized_access(session_id: str) -> bool:
         print_error(f"Exception checking unauthorized access: {e}")
         return False
 
-def test_remove_participant(session_id: str, user_id: str, participant_id: str) -> bool:
+async def test_remove_participant(client: httpx.AsyncClient, session_url: str, user_id: str, participant_id: str) -> bool:
     """Test removing a participant"""
     print_info(f"Test 7: Removing participant '{participant_id}'...")
     
     try:
-        response = requests.delete(
-            f"{BASE_URL}/chat/sessions/{session_id}/participants/{participant_id}",
+        response = await client.delete(
+            f"{session_url}/participants/{participant_id}",
             params={"user_id": user_id}
         )
         
@@ -207,13 +230,13 @@ def test_remove_participant(session_id: str, user_id: str, participant_id: str)
         print_error(f"Exception removing participant: {e}")
         return False
 
-def test_unshare_session(session_id: str, user_id: str) -> bool:
+async def test_unshare_session(client: httpx.AsyncClient, session_url: str, user_id: str) -> bool:
     """Test making session private again"""
     print_info("Test 8: Making session private...")
     
     try:
-        response = requests.delete(
-            f"{BASE_URL}/chat/sessions/{session_id}/share",
+        response = await client.delete(
+            f"{session_url}/share",
             params={"user_id": user_id}
         )
         
@@ -233,8 +256,17 @@ def test_unshare_session(session_id: str, user_id: str) -> bool:
         print_error(f"Exception making private: {e}")
         return False
 
-def run_all_tests():
-    """Run all collaborative sharing tests"""
+async def run_all_tests():
+    """Run all collaborative sharing tests over one pooled AsyncClient"""
+    async with httpx.AsyncClient(
+        base_url=BASE_URL,
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+    ) as client:
+        return await _run_tests(client)
+
+
+async def _run_tests(client: httpx.AsyncClient):
     print("\n" + "="*60)
     print("🧪 COLLABORATIVE CHAT SHARING - TEST SUITE")
     print("="*60 + "\n")
@@ -243,7 +275,7 @@ def run_all_tests():
     session_id = None
     
     # Test 1: Create session
-    session_id = test_create_session(TEST_USER_ID)
+    session_id = await test_create_session(client, TEST_USER_ID)
     results.append(("Create Session", session_id is not None))
     
     if not session_id:
@@ -252,38 +284,40 @@ def run_all_tests():
     
     print()
     
+    # Every later request is under this session's URL; build it once
+    session_url = f"{SESSIONS_PATH}/{session_id}"
+    
     # Test 2: Enable sharing
-    share_result = test_share_session(session_id, TEST_USER_ID)
+    share_result = await test_share_session(client, session_url, TEST_USER_ID)
     results.append(("Enable Sharing", share_result))
     print()
     
     # Test 3: Get participants (should include owner)
-    participants_result = test_get_participants(session_id, TEST_USER_ID)
+    participants_result = await test_get_participants(client, session_url, TEST_USER_ID)
     results.append(("Get Participants", participants_result))
     print()
     
     # Test 4: Add participant
-    add_result = test_add_participant(session_id, TEST_USER_ID, TEST_PARTICIPANT_EMAIL)
+    add_result = await test_add_participant(client, session_url, TEST_USER_ID, TEST_PARTICIPANT_EMAIL)
     results.append(("Add Participant", add_result))
     print()
     
-    # Test 5: Participant can access
-    access_result = test_participant_access(session_id, TEST_PARTICIPANT_EMAIL)
+    # Tests 5 and 6 are independent reads: participant can access, unauthorized user cannot
+    access_result, security_result = await asyncio.gather(
+        test_participant_access(client, session_url, TEST_PARTICIPANT_EMAIL),
+        test_unauthorized_access(client, session_url)
+    )
     results.append(("Participant Access", access_result))
-    print()
-    
-    # Test 6: Unauthorized user cannot access
-    security_result = test_unauthorized_access(session_id)
     results.append(("Block Unauthorized", security_result))
     print()
     
     # Test 7: Remove participant
-    remove_result = test_remove_participant(session_id, TEST_USER_ID, TEST_PARTICIPANT_EMAIL)
+    remove_result = await test_remove_participant(client, session_url, TEST_USER_ID, TEST_PARTICIPANT_EMAIL)
     results.append(("Remove Participant", remove_result))
     print()
     
     # Test 8: Make private
-    unshare_result = test_unshare_session(session_id, TEST_USER_ID)
+    unshare_result = await test_unshare_session(client, session_url, TEST_USER_ID)
     results.append(("Make Private", unshare_result))
     print()
     
@@ -292,12 +326,12 @@ def run_all_tests():
     print("📊 TEST SUMMARY")
     print("="*60 + "\n")
     
-    passed = sum(1 for _, result in results if result)
+    passed = sum(map(itemgetter(1), results))
     total = len(results)
     
-    for test_name, result in results:
-        status = f"{Colors.GREEN}✅ PASS{Colors.END}" if result else f"{Colors.RED}❌ FAIL{Colors.END}"
-        print(f"{test_name:.<40} {status}")
+    lines = [f"{test_name:.<40} {_PASS if result else _FAIL}" for test_name, result in results]
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
     
     print(f"\n{'='*60}")
     if passed == total:
@@ -310,7 +344,7 @@ def run_all_tests():
 
 if __name__ == "__main__":
     try:
-        success = run_all_tests()
+        success = asyncio.run(run_all_tests())
         exit(0 if success else 1)
     except KeyboardInterrupt:
         print("\n\n⚠️  Tests interrupted by user")
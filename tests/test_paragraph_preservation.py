@@ -1,30 +1,39 @@
 #!/usr/bin/env python3
 """
-Test script to verify paragraph and heading preservation after the fix.
-This demonstrates that the write_docx_with_skeleton() now properly handles:
+Tests for paragraph and heading preservation in write_docx_plain() and
+write_docx_with_skeleton():
 - Double newlines (\n\n) as paragraph breaks
 - Heading detection and application
 - Bold/italic formatting preservation
+
+Each DOCX is written once per module and its word/document.xml read back
+with lxml; the tests only assert on the extracted paragraphs.
+
+Usage:
+    pytest tests/test_paragraph_preservation.py -v
 """
 
-import os
+import io
 import sys
-import tempfile
+import zipfile
+from collections import Counter
 from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pytest
+from lxml import etree
 
 # Add backend to path
 backend_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(backend_dir))
 
-from app.utils.utils import write_docx_with_skeleton, make_style_skeleton_from_docx
+from app.utils.utils import write_docx_plain, write_docx_with_skeleton, make_style_skeleton_from_docx, _save_docx
+import docx
 from docx import Document
 
 
-def test_paragraph_splitting():
-    """Test that paragraphs are properly preserved with double newlines."""
-    
-    # Sample text with double newlines (as produced by the pipeline)
-    sample_text = """Introduction to AI
+# Sample text with double newlines (as produced by the pipeline)
+SPLIT_SAMPLE_TEXT = """Introduction to AI
 
 Artificial intelligence is transforming the world. This is the first paragraph with multiple sentences. It should remain together as one paragraph.
 
@@ -36,46 +45,7 @@ Deep Learning
 
 Neural networks are powerful. This is the third distinct paragraph. Each paragraph should be preserved."""
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        output_path = os.path.join(tmpdir, "test_output.docx")
-        
-        # Write the document
-        result_path = write_docx_with_skeleton(
-            text=sample_text,
-            output_path=output_path,
-            skeleton=None,
-            original_file=None
-        )
-        
-        # Verify the file was created
-        assert os.path.exists(result_path), "Output file should exist"
-        
-        # Read back and verify paragraphs
-        doc = Document(result_path)
-        paragraphs = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
-        
-        print("✅ Test: Paragraph Splitting")
-        print(f"   Input had 5 distinct text blocks (3 headings + 3 body paragraphs)")
-        print(f"   Output has {len(paragraphs)} paragraphs")
-        print()
-        
-        # Should have 6 paragraphs (3 headings + 3 body)
-        assert len(paragraphs) >= 5, f"Expected at least 5 paragraphs, got {len(paragraphs)}"
-        
-        print("   Paragraphs found:")
-        for i, para in enumerate(paragraphs, 1):
-            preview = para[:60] + "..." if len(para) > 60 else para
-            print(f"   {i}. {preview}")
-        
-        print()
-        print("✅ PASS: Paragraphs are properly preserved!")
-        return True
-
-
-def test_with_original_formatting():
-    """Test that formatting is preserved when original file exists."""
-    
-    sample_text = """Heading One
+FORMATTED_SAMPLE_TEXT = """Heading One
 
 This is the first paragraph with some content.
 
@@ -87,100 +57,131 @@ Conclusion
 
 This is the final paragraph."""
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # First, create an original document with headings
-        original_path = os.path.join(tmpdir, "original.docx")
-        doc = Document()
-        
-        # Add content with heading styles
-        doc.add_paragraph("Heading One", style='Heading 1')
-        doc.add_paragraph("This is the first paragraph with some content.")
-        doc.add_paragraph("Heading Two", style='Heading 2')
-        doc.add_paragraph("This is the second paragraph with different content.")
-        doc.add_paragraph("Conclusion", style='Heading 1')
-        doc.add_paragraph("This is the final paragraph.")
-        
-        # Make first paragraph bold
-        for run in doc.paragraphs[1].runs:
-            run.bold = True
-        
-        doc.save(original_path)
-        
-        # Extract skeleton
-        skeleton = make_style_skeleton_from_docx(original_path)
-        
-        print("✅ Test: Formatting Preservation")
-        print(f"   Skeleton extracted: {len(skeleton.get('formatting_map', []))} paragraphs")
-        print(f"   Default font: {skeleton.get('default_font', {})}")
-        print()
-        
-        # Now write with skeleton
-        output_path = os.path.join(tmpdir, "refined_output.docx")
-        result_path = write_docx_with_skeleton(
-            text=sample_text,
-            output_path=output_path,
-            skeleton=skeleton,
-            original_file=original_path
-        )
-        
-        # Verify
-        assert os.path.exists(result_path), "Output file should exist"
-        
-        refined_doc = Document(result_path)
-        paragraphs = [p for p in refined_doc.paragraphs if p.text.strip()]
-        
-        print(f"   Output has {len(paragraphs)} paragraphs")
-        print()
-        print("   Paragraph styles:")
-        for i, para in enumerate(paragraphs, 1):
-            style_name = para.style.name if para.style else "None"
-            text_preview = para.text[:40] + "..." if len(para.text) > 40 else para.text
-            print(f"   {i}. [{style_name}] {text_preview}")
-        
-        # Check that at least some headings were applied
-        heading_styles = [p.style.name for p in paragraphs if p.style and 'Heading' in p.style.name]
-        
-        print()
-        if heading_styles:
-            print(f"✅ PASS: Found {len(heading_styles)} heading(s) - formatting preserved!")
-        else:
-            print("⚠️  WARNING: No headings detected (may need threshold tuning)")
-        
-        return True
-
-
-def main():
-    """Run all tests."""
-    print("=" * 70)
-    print("PARAGRAPH PRESERVATION TEST SUITE")
-    print("=" * 70)
-    print()
-    
-    try:
-        test_paragraph_splitting()
-        print()
-        test_with_original_formatting()
-        print()
-        print("=" * 70)
-        print("✅ ALL TESTS PASSED!")
-        print("=" * 70)
-        print()
-        print("Summary:")
-        print("- Paragraphs are now properly split on double newlines (\\n\\n)")
-        print("- Heading detection and mapping is working")
-        print("- Formatting preservation logic is active")
-        print()
-        return 0
-    except Exception as e:
-        print()
-        print("=" * 70)
-        print("❌ TEST FAILED!")
-        print("=" * 70)
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
-        return 1
-
-
-if __name__ == "__main__":
-    sys.exit(main())
+# (text, style) of the original document the skeleton is taken from
+ORIGINAL_PARAGRAPHS = [
+    ("Heading One", "Heading 1"),
+    ("This is the first paragraph with some content.", None),
+    ("Heading Two", "Heading 2"),
+    ("This is the second paragraph with different content.", None),
+    ("Conclusion", "Heading 1"),
+    ("This is the final paragraph.", None),
+]
+
+
+# python-docx's blank template, read once; Document() would reopen it from disk each time
+TEMPLATE_BYTES = (Path(docx.__file__).parent / "templates" / "default.docx").read_bytes()
+
+# Style ids of Word's built-in heading levels ("Heading 1" is stored as Heading1)
+HEADING_STYLE_IDS = frozenset(f"Heading{level}" for level in range(1, 10))
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def read_paragraphs(docx_path) -> List[Tuple[str, Optional[str]]]:
+    """(text, style id) of every non-blank <w:p> in the DOCX body, straight from the XML"""
+    with zipfile.ZipFile(docx_path) as docx:
+        tree = etree.fromstring(docx.read("word/document.xml"))
+    paragraphs = []
+    for p in tree.iter(W + "p"):
+        text = "".join(t.text or "" for t in p.iter(W + "t")).strip()
+        if text:
+            style = p.find(f"{W}pPr/{W}pStyle")
+            paragraphs.append((text, style.get(W + "val") if style is not None else None))
+    return paragraphs
+
+
+@pytest.fixture(scope="module")
+def split_doc(tmp_path_factory):
+    """Paragraphs of SPLIT_SAMPLE_TEXT written without a skeleton"""
+    output_path = tmp_path_factory.mktemp("split") / "test_output.docx"
+    result_path = write_docx_plain(SPLIT_SAMPLE_TEXT, str(output_path))
+    assert Path(result_path).exists(), "Output file should exist"
+    return read_paragraphs(result_path)
+
+
+@pytest.fixture(scope="module")
+def refined_doc(tmp_path_factory):
+    """(skeleton, output paragraphs) for FORMATTED_SAMPLE_TEXT written over a headed original"""
+    tmpdir = tmp_path_factory.mktemp("formatted")
+    original_path = str(tmpdir / "original.docx")
+
+    doc = Document(io.BytesIO(TEMPLATE_BYTES))
+    for text, style in ORIGINAL_PARAGRAPHS:
+        doc.add_paragraph(text, style=style)
+    # Make first body paragraph bold
+    for run in doc.paragraphs[1].runs:
+        run.bold = True
+    doc.save(original_path)
+
+    skeleton = make_style_skeleton_from_docx(original_path)
+    result_path = write_docx_with_skeleton(
+        text=FORMATTED_SAMPLE_TEXT,
+        output_path=str(tmpdir / "refined_output.docx"),
+        skeleton=skeleton,
+        original_file=original_path
+    )
+    assert Path(result_path).exists(), "Output file should exist"
+    return skeleton, read_paragraphs(result_path)
+
+
+def test_paragraph_splitting(split_doc):
+    """Double newlines split the text into separate paragraphs"""
+    # 3 headings + 3 body paragraphs; at least 5 must survive as distinct blocks
+    assert len(split_doc) >= 5, f"Expected at least 5 paragraphs, got {len(split_doc)}"
+
+
+def test_skeleton_extracted(refined_doc):
+    """The skeleton records every paragraph of the original"""
+    skeleton, _ = refined_doc
+    assert len(skeleton.get("texts", [])) == len(ORIGINAL_PARAGRAPHS)
+
+
+def test_with_original_formatting(refined_doc):
+    """Headings from the original are applied to the refined output"""
+    _, paragraphs = refined_doc
+
+    assert len(paragraphs) == len(ORIGINAL_PARAGRAPHS)
+
+    # Tally heading styles in one pass
+    heading_counts = Counter(style for _, style in paragraphs if style in HEADING_STYLE_IDS)
+    assert sum(heading_counts.values()), "No headings detected (may need threshold tuning)"
+
+
+def _build_original_doc():
+    doc = Document(io.BytesIO(TEMPLATE_BYTES))
+    for text, style in ORIGINAL_PARAGRAPHS:
+        doc.add_paragraph(text, style=style)
+    return doc
+
+
+def _reopened_paragraphs(path) -> List[Tuple[str, str]]:
+    return [(p.text, p.style.name) for p in Document(str(path)).paragraphs]
+
+
+def test_save_docx_matches_doc_save(tmp_path):
+    """_save_docx output reopens with python-docx and matches doc.save()"""
+    doc = _build_original_doc()
+    fast_path = tmp_path / "fast.docx"
+    plain_path = tmp_path / "plain.docx"
+    _save_docx(doc, str(fast_path))
+    doc.save(str(plain_path))
+
+    with zipfile.ZipFile(fast_path) as fast, zipfile.ZipFile(plain_path) as plain:
+        assert sorted(fast.namelist()) == sorted(plain.namelist())
+    assert _reopened_paragraphs(fast_path) == _reopened_paragraphs(plain_path)
+
+
+def test_save_docx_falls_back_to_doc_save(tmp_path, monkeypatch):
+    """If python-docx's private writer API changes shape, doc.save() is used"""
+    import app.utils.utils as utils
+
+    class _MismatchedWriter(utils._DocxZipWriter):
+        def write(self, pack_uri, blob):
+            # What a renamed PackURI attribute would look like from our side
+            raise AttributeError("'PackURI' object has no attribute 'membername'")
+
+    monkeypatch.setattr(utils, "_DocxZipWriter", _MismatchedWriter)
+
+    path = tmp_path / "fallback.docx"
+    _save_docx(_build_original_doc(), str(path))
+    assert _reopened_paragraphs(path) == [(text, style or "Normal") for text, style in ORIGINAL_PARAGRAPHS]
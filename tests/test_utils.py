@@ -6,9 +6,11 @@ from typing import List
 import time
 
 
-@dataclass
+@dataclass(slots=True)
 class TestResult:
     """Stores test results for reporting"""
+    __test__ = False  # not a pytest test class
+    
     name: str
     passed: bool
     message: str = ""
@@ -19,6 +21,7 @@ class TestRunner:
     """Simple test runner for standalone execution"""
     def __init__(self):
         self.results: List[TestResult] = []
+        self.failed_results: List[TestResult] = []
         self.passed = 0
         self.failed = 0
     
@@ -28,23 +31,27 @@ class TestRunner:
         print(f"Running: {name}")
         print('='*80)
         
-        start = time.time()
+        start = time.perf_counter_ns()
         try:
             test_func()
-            duration = time.time() - start
+            duration = (time.perf_counter_ns() - start) / 1e9
             self.results.append(TestResult(name, True, "Passed", duration))
             self.passed += 1
             print(f"✅ PASSED in {duration:.2f}s")
         except AssertionError as e:
-            duration = time.time() - start
+            duration = (time.perf_counter_ns() - start) / 1e9
             error_msg = str(e) or "Assertion failed"
-            self.results.append(TestResult(name, False, error_msg, duration))
+            result = TestResult(name, False, error_msg, duration)
+            self.results.append(result)
+            self.failed_results.append(result)
             self.failed += 1
             print(f"❌ FAILED in {duration:.2f}s: {error_msg}")
         except Exception as e:
-            duration = time.time() - start
+            duration = (time.perf_counter_ns() - start) / 1e9
             error_msg = f"{type(e).__name__}: {str(e)}"
-            self.results.append(TestResult(name, False, error_msg, duration))
+            result = TestResult(name, False, error_msg, duration)
+            self.results.append(result)
+            self.failed_results.append(result)
             self.failed += 1
             print(f"❌ ERROR in {duration:.2f}s: {error_msg}")
     
@@ -61,9 +68,8 @@ class TestRunner:
         
         if self.failed > 0:
             print("\n❌ Failed Tests:")
-            for result in self.results:
-                if not result.passed:
-                    print(f"  - {result.name}: {result.message}")
+            for result in self.failed_results:
+                print(f"  - {result.name}: {result.message}")
         
         print(f"\n{'='*80}")
         